@@ -7,6 +7,9 @@ import time
 import pickle
 import os
 
+from subword import _UNK_, _PAD_, _GO_, _END_, unk_id, pad_id, go_id, end_id, MASK_INFO  # noqa: F401
+from subword import learn_bpe, SubwordEncoder
+
 
 class PreProcessing(object):
     """
@@ -147,22 +150,6 @@ class SentenceConverter(object):
 '======================================================================================================================'
 
 
-_UNK_ = '_UNK_'     # 알수없는 단어를 표시하기 위한 mask (단어장에 존재 하지 않는 단어)
-_PAD_ = '_PAD_'     # 길이를 맞춰주기 위한 mask
-_GO_ = '_GO_'       # 문장의 시작을 알려주기위한 mask
-_END_ = '_END_'     # 문장의 끝을 알려구기위한 mask
-unk_id = 0          # _UNK_ number id
-pad_id = 1          # _PAD_ number id
-go_id = 2           # _GO_  number id
-end_id = 3          # _EMD_ number id
-MASK_INFO = {
-    _UNK_: unk_id,
-    _PAD_: pad_id,
-    _GO_: go_id,
-    _END_: end_id
-}
-
-
 def make_dictionary(
         file_path_list,
         save_point,
@@ -252,6 +239,102 @@ def make_dictionary(
 '======================================================================================================================'
 
 
+def count_words(file_path_list, sentence_converter_func):
+    """
+    데이터셋에 등장하는 단어들의 출현횟수를 세는 기능
+
+    :param file_path_list: 데이터셋 path 리스트 (type: list)
+    :param sentence_converter_func: 데이터셋의 문장을 전처리하기 위한 lambda function  (type: func)
+    :return: 단어별 출현횟수 (type: collections.Counter)
+    """
+    word_counts = collections.Counter()
+    for file_path in file_path_list:
+        with open(file_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                word_counts.update(sentence_converter_func(row['title']))
+                word_counts.update(sentence_converter_func(row['content']))
+    return word_counts
+
+
+def make_subword_dictionary(
+        file_path_list,
+        save_point,
+        sentence_converter_func,
+        vocab_size=16000,
+        min_frequency=2):
+    """
+    학습/테스트에 필요한 subword 단어장, word2idx 사전, idx2word 사전, 병합 규칙, subword 출현횟수를 만들어주는 기능
+    make_dictionary 의 단어 사전을 덮어쓰지 않도록 save_point/subword 아래에 저장
+
+    사전의 항목은 단어가 아니라 subword 이므로, 단어를 사전에서 바로 찾지 말고
+    merges_path 와 함께 SubwordEncoder 로 변환해야 함 (BatchIter 의 merges_path 인자 참고)
+
+    :param file_path_list: 데이터셋 path 리스트 (type: list)
+    :param save_point: 결과물을 저장할 디렉토리 위치, 실제로는 save_point/subword 에 저장 (type: str)
+    :param sentence_converter_func: 데이터셋의 문장을 전처리하기 위한 lambda function  (type: func)
+    :param vocab_size: MASK_INFO 를 포함한 목표 단어장 크기 (ex: 8000 ~ 16000) (type: int)
+    :param min_frequency: 이 값보다 적게 등장하는 쌍은 병합하지 않음 (type: int)
+    :return: vocabulary_path, word2idx_path, idx2word_path, merges_path, counts_path
+        merges_path : 병합 규칙 저장 위치
+        counts_path : subword id 별 출현횟수 저장 위치 (adaptive softmax 의 cluster 를 나눌 때 사용)
+    """
+
+    start_time = time.time()
+
+    # 결과물들을 저장할 파일 생성
+    save_point = os.path.join(save_point, 'subword')
+    if not os.path.exists(os.path.join(save_point, 'dict')):
+        abs_save_path = os.path.abspath(os.path.join(save_point, 'dict'))
+        os.makedirs(abs_save_path)
+
+    # 파일이름
+    vocabulary_path = os.path.join(save_point, 'vocabulary.txt')
+    word2idx_path = os.path.join(save_point, 'dict', 'word2idx.dic')
+    idx2word_path = os.path.join(save_point, 'dict', 'idx2word.dic')
+    merges_path = os.path.join(save_point, 'dict', 'merges.dic')
+    counts_path = os.path.join(save_point, 'dict', 'counts.dic')
+
+    word_counts = count_words(file_path_list, sentence_converter_func)
+    vocab, merges = learn_bpe(word_counts, vocab_size, min_frequency)
+
+    print('subword 단어 리스트 완성...')
+
+    word2idx = dict()
+    idx2word = dict()
+    with open(vocabulary_path, 'w', encoding='utf-8') as vocabulary_fp:
+        for i, word in enumerate(vocab):
+            vocabulary_fp.write(str(word) + '\n')    # vocabulary.txt 에 단어 리스트 저장
+            idx2word[i] = word
+            word2idx[word] = i
+
+    # subword id 별 출현횟수
+    encoder = SubwordEncoder(word2idx, merges)
+    counts = collections.Counter()
+    for word, freq in word_counts.items():
+        for idx in encoder.encode_word(word):
+            counts[idx] += freq
+
+    with open(word2idx_path, 'wb') as f:
+        pickle.dump(word2idx, f)            # word2idx.dic 에 딕셔너리 저장
+    with open(idx2word_path, 'wb') as f:
+        pickle.dump(idx2word, f)            # idx2word.dic 에 딕셔너리 저장
+    with open(merges_path, 'wb') as f:
+        pickle.dump(merges, f)              # merges.dic 에 병합 규칙 저장
+    with open(counts_path, 'wb') as f:
+        pickle.dump(dict(counts), f)        # counts.dic 에 subword 출현횟수 저장
+
+    end_time = time.time()
+    diff_time = round(end_time - start_time, 3)
+
+    print('subword 단어장/사전 저장 완료... 총 걸린 시간 : {} sec, 총 단어 갯수 : {}'.format(diff_time, len(vocab)))
+    return vocabulary_path, word2idx_path, idx2word_path, merges_path, counts_path
+
+'======================================================================================================================'
+'======================================================================================================================'
+'======================================================================================================================'
+
+
 class ParentBachIter(object):
     def __init__(self,
                  data_paths,
@@ -259,14 +342,18 @@ class ParentBachIter(object):
                  batch_size,
                  word2idx_path,
                  idx2word_path,
-                 sentence_converter_func):
+                 sentence_converter_func,
+                 merges_path=None):
         self.data_paths = data_paths
         self.epochs = epochs
         self.batch_size = batch_size
         self.word2idx_path = word2idx_path
         self.idx2word_path = idx2word_path
+        self.merges_path = merges_path
         self.sentence_converter_func = sentence_converter_func
         self.word2idx, self.idx2word = self._load_dictionary()
+        # make_subword_dictionary 로 만든 사전이면 단어를 subword 로 나눠서 변환
+        self.encoder = SubwordEncoder.load(word2idx_path, merges_path) if merges_path else None
 
     def _load_dictionary(self):
         """
@@ -283,6 +370,17 @@ class ParentBachIter(object):
         idx2word = pickle.load(open(self.idx2word_path, 'rb'))
         return word2idx, idx2word
 
+    def sentence_to_ids(self, tokens):
+        """
+        토큰나이즈 된 문장을 사전의 id 리스트로 변환하는 기능 (사전에 없는 단어는 _UNK_)
+
+        :param tokens: 토큰 리스트 (type: list)
+        :return: id 리스트 (type: list)
+        """
+        if self.encoder is not None:
+            return self.encoder.encode(tokens)
+        return [self.word2idx.get(token, unk_id) for token in tokens]
+
     def _get_data_set(self):
         for data_path in self.data_paths:
             print(data_path)
@@ -300,14 +398,16 @@ class Word2VecModelBatchIter(ParentBachIter):
                  window_size,
                  word2idx_path,
                  idx2word_path,
-                 sentence_converter_func):
+                 sentence_converter_func,
+                 merges_path=None):
         super(Word2VecModelBatchIter, self).__init__(
             data_paths=data_paths,
             epochs=epochs,
             batch_size=batch_size,
             word2idx_path=word2idx_path,
             idx2word_path=idx2word_path,
-            sentence_converter_func=sentence_converter_func
+            sentence_converter_func=sentence_converter_func,
+            merges_path=merges_path
         )
         self.window_size = window_size
 
@@ -319,14 +419,16 @@ class SummaryModelBatchIter(ParentBachIter):
                  batch_size,
                  word2idx_path,
                  idx2word_path,
-                 sentence_converter_func):
+                 sentence_converter_func,
+                 merges_path=None):
         super(SummaryModelBatchIter, self).__init__(
             data_paths=data_paths,
             epochs=epochs,
             batch_size=batch_size,
             word2idx_path=word2idx_path,
             idx2word_path=idx2word_path,
-            sentence_converter_func=sentence_converter_func
+            sentence_converter_func=sentence_converter_func,
+            merges_path=merges_path
         )
 
     def next_batches(self):
@@ -0,0 +1,302 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from subword import SubwordEncoder, unk_id, pad_id, go_id, end_id
+
+
+_GRAPH_FILE = 'graph.pb'                # 얼린 추론 그래프
+_VOCAB_FILE = 'vocab.dic'               # word2idx, idx2word, merges, counts
+_META_FILE = 'meta.json'                # 입출력 tensor 이름, 그래프 밖에 둔 변수 파일, 모델 설정
+_WORD2IDX_PATH = '../data/words/dict/word2idx.dic'
+_IDX2WORD_PATH = '../data/words/dict/idx2word.dic'
+
+_INPUT_NODES = {
+    'encoder_inputs': 'inputs/encoder_inputs',
+    'encoder_length': 'inputs/encoder_length',
+    'max_length': 'inference/max_length'
+}
+_OUTPUT_NODE = 'inference/summary_ids'
+
+
+def export_inference_model(
+        model,
+        session,
+        export_dir,
+        word2idx_path,
+        idx2word_path,
+        merges_path=None):
+    """
+    학습된 SummaryModel 을 추론 전용 artifact 로 내보내는 기능
+
+    1. graph.pb : 변수들을 상수로 바꾸고 요약문 생성에 필요없는 학습용 op(loss, optimizer 등)를 제거한 그래프
+    2. *.npy : model.vocab_variables 의 단어장 크기에 비례하는 변수들 (embedding, 출력층, adaptive softmax 의 head/tail)
+               그래프에서는 placeholder 로 바꾸고 np.load(mmap_mode='r') 로 불러옴
+               (큰 상수를 protobuf 로 파싱하지 않기 때문에 로딩이 빠르고 필요한 부분만 메모리에 올라감)
+    3. vocab.dic : word2idx, idx2word 사전, subword 병합 규칙, 단어 출현횟수 (checkpoint 로 모델을 다시 만들 때 사용)
+    4. meta.json : 입출력 tensor 이름, 그래프 밖에 둔 변수 파일 이름, 모델 설정
+
+    :param model: 학습된 SummaryModel (type: SummaryModel)
+    :param session: model 의 변수가 올라가 있는 session (type: tf.Session)
+    :param export_dir: artifact 를 저장할 디렉토리 위치 (type: str)
+    :param word2idx_path: word2idx.dic 위치 (type: str)
+    :param idx2word_path: idx2word.dic 위치 (type: str)
+    :param merges_path: make_subword_dictionary 로 만든 merges.dic 위치, 단어 단위 사전이면 None (type: str)
+    :return: export_dir
+    """
+    start_time = time.time()
+
+    if not os.path.exists(export_dir):
+        os.makedirs(os.path.abspath(export_dir))
+
+    # 단어장 크기에 비례하는 큰 변수들은 상수로 바꾸지 않고 그래프 밖에 저장 (GRU 등 나머지 변수는 상수로 변환)
+    large_variables = {variable.op.name: variable for variable in model.vocab_variables}
+
+    # 변수 -> 상수 변환 (출력 노드에 필요한 부분만 남기므로 학습용 op 들은 이 단계에서 제거됨)
+    # remove_training_nodes 는 while_loop 안의 Identity 까지 지워 그래프가 깨질 수 있어 사용하지 않음
+    graph_def = tf.graph_util.convert_variables_to_constants(
+        session,
+        model.graph.as_graph_def(),
+        [_OUTPUT_NODE],
+        variable_names_blacklist=list(large_variables))
+
+    # 남아있는 큰 변수들은 placeholder 로 바꿔 그래프 밖(mmap)에서 넣어줌 (optimizer slot 등은 이미 제거됨)
+    external = dict()
+    for node in graph_def.node:
+        if node.name in large_variables:
+            node.op = 'Placeholder'
+            for attr in ('container', 'shared_name'):
+                if attr in node.attr:
+                    del node.attr[attr]
+            file_name = node.name.replace('/', '__') + '.npy'
+            value = session.run(large_variables[node.name])
+            np.save(os.path.join(export_dir, file_name), np.ascontiguousarray(value))
+            external[node.name + ':0'] = file_name
+
+    with open(os.path.join(export_dir, _GRAPH_FILE), 'wb') as f:
+        f.write(graph_def.SerializeToString())
+
+    with open(word2idx_path, 'rb') as f:
+        word2idx = pickle.load(f)
+    with open(idx2word_path, 'rb') as f:
+        idx2word = pickle.load(f)
+    merges = None
+    if merges_path:
+        with open(merges_path, 'rb') as f:
+            merges = pickle.load(f)
+    with open(os.path.join(export_dir, _VOCAB_FILE), 'wb') as f:
+        pickle.dump({'word2idx': word2idx, 'idx2word': idx2word, 'merges': merges, 'counts': model.counts}, f)
+
+    meta = {
+        'inputs': {key: name + ':0' for key, name in _INPUT_NODES.items()},
+        'output': _OUTPUT_NODE + ':0',
+        'external': external,
+        'vocab_size': model.vocab_size,
+        'embedding_size': model.embedding_size,
+        'hidden_size': model.hidden_size,
+        'softmax_type': model.softmax_type,
+        'num_sampled': model.num_sampled,
+        'cutoffs': list(model.cutoffs)
+    }
+    with open(os.path.join(export_dir, _META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    diff_time = round(time.time() - start_time, 3)
+    print('추론 모델 저장 완료... 총 걸린 시간 : {} sec, 저장 위치 : {}'.format(diff_time, export_dir))
+    return export_dir
+
+
+class InferenceModel(object):
+    """
+    export_inference_model 로 저장한 artifact 를 불러와 요약문을 생성하는 클래스
+    SummaryModel 그래프를 다시 만들지 않고 얼린 그래프를 그대로 불러옴
+    """
+    def __init__(self, export_dir):
+        """
+        :param export_dir: artifact 디렉토리 위치 (type: str)
+        """
+        with open(os.path.join(export_dir, _META_FILE), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(export_dir, _VOCAB_FILE), 'rb') as f:
+            vocab = pickle.load(f)
+        self.word2idx = vocab['word2idx']
+        self.idx2word = vocab['idx2word']
+        self._encoder = SubwordEncoder(self.word2idx, vocab['merges']) if vocab['merges'] else None
+
+        graph_def = tf.GraphDef()
+        with open(os.path.join(export_dir, _GRAPH_FILE), 'rb') as f:
+            graph_def.ParseFromString(f.read())
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        self.session = tf.Session(graph=self.graph)
+
+        inputs = self.meta['inputs']
+        self._encoder_inputs = self.graph.get_tensor_by_name(inputs['encoder_inputs'])
+        self._encoder_length = self.graph.get_tensor_by_name(inputs['encoder_length'])
+        self._max_length = self.graph.get_tensor_by_name(inputs['max_length'])
+        self._summary_ids = self.graph.get_tensor_by_name(self.meta['output'])
+
+        # 그래프 밖에 둔 변수들은 mmap 으로 열어두고 실행할 때 feed
+        self._external = {
+            self.graph.get_tensor_by_name(tensor_name): np.load(os.path.join(export_dir, file_name), mmap_mode='r')
+            for tensor_name, file_name in self.meta['external'].items()
+        }
+
+    def close(self):
+        self.session.close()
+
+    def _encode(self, tokens):
+        if self._encoder is not None:
+            return self._encoder.encode(tokens)
+        return [self.word2idx.get(token, unk_id) for token in tokens]
+
+    def _decode(self, ids):
+        ids = list(ids)
+        if end_id in ids:
+            ids = ids[:ids.index(end_id)]
+        if self._encoder is not None:
+            return self._encoder.decode(ids)
+        return [self.idx2word[idx] for idx in ids if idx not in (pad_id, go_id)]
+
+    def summarize(self, token_lists, max_length=30):
+        """
+        토큰나이즈 된 본문들의 요약문을 생성하는 기능
+
+        :param token_lists: 본문 토큰 리스트들 (type: list)
+        :param max_length: 요약문 최대 길이 (type: int)
+        :return: 요약문 토큰 리스트들 (type: list)
+        """
+        sequences = [self._encode(tokens) or [unk_id] for tokens in token_lists]
+        lengths = np.array([len(seq) for seq in sequences], dtype=np.int32)
+        batch = np.full((len(sequences), lengths.max()), pad_id, dtype=np.int32)
+        for i, seq in enumerate(sequences):
+            batch[i, :len(seq)] = seq
+
+        feed_dict = {
+            self._encoder_inputs: batch,
+            self._encoder_length: lengths,
+            self._max_length: max_length
+        }
+        feed_dict.update(self._external)
+        summary_ids = self.session.run(self._summary_ids, feed_dict=feed_dict)
+        return [self._decode(ids) for ids in summary_ids]
+
+
+def _first_summary(mode, artifact_dir):
+    """
+    cold start 측정용. 새 프로세스에서 모델을 불러와 첫번째 요약문을 생성
+
+    :param mode: 'frozen' (export 한 artifact) 또는 'checkpoint' (그래프를 다시 만들고 tf.train.Saver 로 복원)
+    :param artifact_dir: export_dir 또는 checkpoint 디렉토리 (type: str)
+    """
+    tokens = [['북한', '풍계리', '핵실험장', '폭파']]
+    if mode == 'frozen':
+        model = InferenceModel(artifact_dir)
+        print(model.summarize(tokens))
+        return
+
+    from summary_model import SummaryModel
+    with open(os.path.join(artifact_dir, _META_FILE), encoding='utf-8') as f:
+        meta = json.load(f)
+    with open(os.path.join(artifact_dir, _VOCAB_FILE), 'rb') as f:
+        vocab = pickle.load(f)
+    word2idx = vocab['word2idx']
+    model = SummaryModel(
+        vocab_size=meta['vocab_size'],
+        embedding_size=meta['embedding_size'],
+        hidden_size=meta['hidden_size'],
+        softmax_type=meta['softmax_type'],
+        counts=vocab['counts'],
+        num_sampled=meta['num_sampled'],
+        cutoffs=meta['cutoffs']
+    )
+    with tf.Session(graph=model.graph) as session:
+        model.saver.restore(session, os.path.join(artifact_dir, 'model.ckpt'))
+        if vocab['merges']:
+            ids = [SubwordEncoder(word2idx, vocab['merges']).encode(tokens[0])]
+        else:
+            ids = [[word2idx.get(token, unk_id) for token in tokens[0]]]
+        print(session.run(model.summary_ids, feed_dict={
+            model.encoder_inputs: ids,
+            model.encoder_length: [len(ids[0])]
+        }))
+
+
+def benchmark_cold_start(export_dir, checkpoint_dir, repeat=3):
+    """
+    프로세스 시작부터 첫번째 요약문이 나올 때까지 걸리는 시간을 측정하는 기능 (artifact vs checkpoint 복원)
+
+    :param export_dir: export_inference_model 로 저장한 디렉토리 (type: str)
+    :param checkpoint_dir: model.ckpt, meta.json, vocab.dic 이 있는 디렉토리 (type: str)
+    :param repeat: 반복 횟수 (type: int)
+    :return: {'frozen': 평균 sec, 'checkpoint': 평균 sec} (type: dict)
+    """
+    result = dict()
+    for mode, artifact_dir in (('frozen', export_dir), ('checkpoint', checkpoint_dir)):
+        elapsed = list()
+        for _ in range(repeat):
+            start_time = time.time()
+            subprocess.check_call(
+                [sys.executable, os.path.abspath(__file__), 'first_summary', mode, artifact_dir],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stdout=subprocess.DEVNULL)
+            elapsed.append(time.time() - start_time)
+        result[mode] = sum(elapsed) / len(elapsed)
+        print('{:>10} : 첫 요약문까지 평균 {:.3f} sec'.format(mode, result[mode]))
+    return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == 'first_summary':
+        _first_summary(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    from summary_model import SummaryModel
+
+    # 학습된 모델 대신 실제 사전 크기의 작은 랜덤 모델들로 export 후 cold start 비교
+    word2idx_file = sys.argv[1] if len(sys.argv) > 1 else _WORD2IDX_PATH
+    idx2word_file = sys.argv[2] if len(sys.argv) > 2 else _IDX2WORD_PATH
+    with open(word2idx_file, 'rb') as fp:
+        vocab_size = len(pickle.load(fp))
+
+    # sampled / adaptive 출력층을 위한 zipf 분포의 가짜 출현횟수
+    rng = np.random.RandomState(0)
+    zipf = 1.0 / np.arange(1, vocab_size + 1) ** 1.1
+    fake_counts = dict(zip(rng.permutation(vocab_size).tolist(), (zipf * 1e6).astype(np.int64).tolist()))
+
+    # checkpoint(Adam slot 포함)와 artifact 가 수백 MB 이므로 측정 후 삭제
+    with tempfile.TemporaryDirectory() as work_dir:
+        for softmax_type in ('full', 'adaptive'):
+            export_path = os.path.join(work_dir, softmax_type, 'export')
+            checkpoint_path = os.path.join(work_dir, softmax_type, 'checkpoint')
+            os.makedirs(checkpoint_path)
+
+            summary_model = SummaryModel(
+                vocab_size=vocab_size,
+                embedding_size=64,
+                hidden_size=64,
+                softmax_type=softmax_type,
+                counts=fake_counts
+            )
+            with tf.Session(graph=summary_model.graph) as sess:
+                sess.run(summary_model.init)
+                summary_model.saver.save(sess, os.path.join(checkpoint_path, 'model.ckpt'))
+                export_inference_model(summary_model, sess, export_path, word2idx_file, idx2word_file)
+
+            for name in (_META_FILE, _VOCAB_FILE):
+                with open(os.path.join(export_path, name), 'rb') as src, \
+                        open(os.path.join(checkpoint_path, name), 'wb') as dst:
+                    dst.write(src.read())
+
+            print('softmax : {}, graph.pb : {:.1f} KB'.format(
+                softmax_type, os.path.getsize(os.path.join(export_path, _GRAPH_FILE)) / 1024.0))
+            benchmark_cold_start(export_path, checkpoint_path)
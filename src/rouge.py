@@ -0,0 +1,324 @@
+# -*- coding:utf-8 -*-
+import collections
+import multiprocessing
+import pickle
+import sys
+import time
+
+import numpy as np
+
+from subword import unk_id, pad_id, go_id, end_id
+
+
+_IGNORE_IDS = (pad_id, go_id, end_id)  # 점수 계산에서 제외할 mask id
+_HASH_BASE = 1 << 20                    # n-gram 해시를 만들기 위한 진법 (단어장 크기보다 커야 함)
+_REF_PAD = -1                           # 정답 문장 패딩 값
+_CAND_PAD = -2                          # 후보 문장 패딩 값 (정답 패딩과 절대 일치하지 않도록 다른 값 사용)
+_REF_UNK = _HASH_BASE - 1               # 정답 문장의 _UNK_ 대체 값 (단어장 밖의 값이라 어떤 id 와도 일치하지 않음)
+_CAND_UNK = _HASH_BASE - 2              # 후보 문장의 _UNK_ 대체 값 (정답의 _UNK_ 와 일치하지 않도록 다른 값 사용)
+_WORD2IDX_PATH = '../data/words/dict/word2idx.dic'
+
+
+def sentence_to_ids(tokens, word2idx, encoder=None):
+    """
+    토큰나이즈 된 문장을 word2idx 사전을 이용하여 id 리스트로 변환하는 기능
+    단어장에 없는 단어는 _UNK_ 로 변환
+
+    :param tokens: 토큰 리스트 (type: list)
+    :param word2idx: word2idx 사전 (type: dict)
+    :param encoder: subword 사전이면 SubwordEncoder, 단어 사전이면 None (type: SubwordEncoder)
+    :return: id 리스트 (type: list)
+    """
+    if encoder is not None:
+        return encoder.encode(tokens)
+    return [word2idx.get(token, unk_id) for token in tokens]
+
+
+def _clean_ids(ids, unk_value):
+    """
+    id 시퀀스에서 _PAD_, _GO_, _END_ 를 제거하여 int64 numpy 배열로 변환
+    _UNK_ 는 길이(분모)에는 포함되지만 서로 일치하지 않도록 unk_value 로 바꿈
+
+    :param ids: id 시퀀스 (type: list or np.ndarray)
+    :param unk_value: _UNK_ 대신 넣을 값 (정답은 _REF_UNK, 후보는 _CAND_UNK) (type: int)
+    :return: 정제된 id 배열 (type: np.ndarray)
+    """
+    ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+    ids = ids[~np.isin(ids, _IGNORE_IDS)]
+    return np.where(ids == unk_id, unk_value, ids)
+
+
+def _hash_ngrams(ids, n):
+    """
+    id 배열의 n-gram 들을 하나의 int64 값으로 해싱하는 기능
+    ex) n=2, [a, b, c] -> [a * BASE + b, b * BASE + c]
+
+    :param ids: 정제된 id 배열 (type: np.ndarray)
+    :param n: n-gram 크기 (type: int)
+    :return: n-gram 해시 배열 (type: np.ndarray)
+    """
+    length = len(ids) - n + 1
+    if length <= 0:
+        return np.empty(0, dtype=np.int64)
+    hashed = ids[:length].copy()
+    for k in range(1, n):
+        hashed = hashed * _HASH_BASE + ids[k:k + length]
+    return hashed
+
+
+def _ngram_overlap(ref_ids, cand_ids, n):
+    """
+    두 id 배열 사이의 n-gram 겹침 갯수(중복 허용 교집합 크기)를 계산
+
+    :return: overlap, 정답 n-gram 갯수, 후보 n-gram 갯수
+    """
+    ref_hash = _hash_ngrams(ref_ids, n)
+    cand_hash = _hash_ngrams(cand_ids, n)
+    if len(ref_hash) == 0 or len(cand_hash) == 0:
+        return 0, len(ref_hash), len(cand_hash)
+
+    ref_keys, ref_counts = np.unique(ref_hash, return_counts=True)
+    cand_keys, cand_counts = np.unique(cand_hash, return_counts=True)
+    _, ref_idx, cand_idx = np.intersect1d(ref_keys, cand_keys, assume_unique=True, return_indices=True)
+    overlap = np.minimum(ref_counts[ref_idx], cand_counts[cand_idx]).sum()
+    return int(overlap), len(ref_hash), len(cand_hash)
+
+
+def _pad_batch(sequences, pad_value):
+    """
+    길이가 다른 id 배열들을 [batch, max_len] 크기의 배열로 패딩
+
+    :return: 패딩된 배열 (type: np.ndarray)
+    """
+    max_len = max([len(seq) for seq in sequences] + [1])
+    batch = np.full((len(sequences), max_len), pad_value, dtype=np.int64)
+    for i, seq in enumerate(sequences):
+        batch[i, :len(seq)] = seq
+    return batch
+
+
+def batch_lcs(references, candidates):
+    """
+    정답/후보 쌍들의 최장 공통 부분 수열(LCS) 길이를 한번에 계산하는 기능
+
+    DP 테이블을 반대각선(i + j = d) 단위로 채우며, 같은 반대각선의 셀들은 서로 의존하지 않기 때문에
+    배치 전체와 반대각선 위의 셀들을 numpy 연산 한번으로 처리 (python 루프는 정답 길이 + 후보 길이 만큼만 실행)
+
+    :param references: 정제된 정답 id 배열 리스트 (type: list)
+    :param candidates: 정제된 후보 id 배열 리스트 (type: list)
+    :return: 각 쌍의 LCS 길이 (type: np.ndarray)
+    """
+    ref_batch = _pad_batch(references, _REF_PAD)
+    cand_batch = _pad_batch(candidates, _CAND_PAD)
+    batch_size, ref_len = ref_batch.shape
+    cand_len = cand_batch.shape[1]
+
+    # 패딩 값끼리는 일치하지 않으므로 패딩 위치는 LCS 길이를 늘리지 않음
+    match = ref_batch[:, :, None] == cand_batch[:, None, :]     # [batch, ref_len, cand_len]
+    table = np.zeros((batch_size, ref_len + 1, cand_len + 1), dtype=np.int32)
+
+    for d in range(2, ref_len + cand_len + 1):
+        i = np.arange(max(1, d - cand_len), min(ref_len, d - 1) + 1)
+        j = d - i
+        table[:, i, j] = np.where(
+            match[:, i - 1, j - 1],
+            table[:, i - 1, j - 1] + 1,
+            np.maximum(table[:, i - 1, j], table[:, i, j - 1])
+        )
+    return table[:, ref_len, cand_len]
+
+
+def _precision_recall_f1(overlap, ref_count, cand_count):
+    """
+    겹침 갯수로부터 precision, recall, f1 을 계산 (분모가 0 이면 0)
+
+    :return: [batch, 3] 크기의 배열 (precision, recall, f1)
+    """
+    overlap = np.asarray(overlap, dtype=np.float64)
+    ref_count = np.asarray(ref_count, dtype=np.float64)
+    cand_count = np.asarray(cand_count, dtype=np.float64)
+    precision = np.divide(overlap, cand_count, out=np.zeros_like(overlap), where=cand_count > 0)
+    recall = np.divide(overlap, ref_count, out=np.zeros_like(overlap), where=ref_count > 0)
+    denominator = precision + recall
+    f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(overlap), where=denominator > 0)
+    return np.stack([precision, recall, f1], axis=1)
+
+
+def _score_chunk(pairs):
+    """
+    프로세스 풀의 각 worker 가 실행하는 함수. 정답/후보 쌍 묶음의 ROUGE-1/2/L 점수를 계산
+
+    :param pairs: (정답 id 리스트, 후보 id 리스트) 튜플 리스트 (type: list)
+    :return: {'rouge-1': [n, 3], 'rouge-2': [n, 3], 'rouge-l': [n, 3]} (type: dict)
+    """
+    references = [_clean_ids(ref, _REF_UNK) for ref, _ in pairs]
+    candidates = [_clean_ids(cand, _CAND_UNK) for _, cand in pairs]
+
+    scores = dict()
+    for n in (1, 2):
+        counts = np.array([_ngram_overlap(ref, cand, n) for ref, cand in zip(references, candidates)],
+                          dtype=np.int64).reshape(-1, 3)
+        scores['rouge-{}'.format(n)] = _precision_recall_f1(counts[:, 0], counts[:, 1], counts[:, 2])
+
+    lcs = batch_lcs(references, candidates)
+    scores['rouge-l'] = _precision_recall_f1(
+        lcs,
+        [len(ref) for ref in references],
+        [len(cand) for cand in candidates]
+    )
+    return scores
+
+
+class RougeEvaluator(object):
+    """
+    word2idx 로 변환된 id 시퀀스를 이용해 요약문(후보)과 제목(정답) 사이의 ROUGE-1/2/L 을 계산하는 클래스
+    """
+    def __init__(self,
+                 num_workers=None,
+                 chunk_size=512):
+        """
+        :param num_workers: 프로세스 풀의 worker 갯수, None 이면 cpu 갯수 (type: int)
+        :param chunk_size: worker 하나가 한번에 처리할 쌍의 갯수 (type: int)
+        """
+        self._num_workers = num_workers or multiprocessing.cpu_count()
+        self._chunk_size = chunk_size
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        프로세스 풀 종료
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _get_pool(self):
+        # 학습 중 검증할 때마다 프로세스를 새로 띄우지 않도록 풀을 재사용
+        # tensorflow 스레드가 돌고 있는 학습 프로세스를 fork 하면 deadlock 이 생길 수 있어 spawn 사용
+        if self._pool is None:
+            self._pool = multiprocessing.get_context('spawn').Pool(self._num_workers)
+        return self._pool
+
+    def score(self, references, candidates):
+        """
+        정답/후보 쌍 각각의 ROUGE 점수를 계산하는 기능
+
+        :param references: 정답 id 시퀀스 리스트 (type: list)
+        :param candidates: 후보 id 시퀀스 리스트 (type: list)
+        :return: {'rouge-1': [n, 3], 'rouge-2': [n, 3], 'rouge-l': [n, 3]}, 열 순서는 (precision, recall, f1)
+        """
+        if len(references) != len(candidates):
+            raise ValueError('references 와 candidates 의 갯수가 다릅니다.')
+
+        pairs = list(zip(references, candidates))
+        chunks = [pairs[i:i + self._chunk_size] for i in range(0, len(pairs), self._chunk_size)]
+        if len(chunks) <= 1 or self._num_workers == 1:
+            results = [_score_chunk(chunk) for chunk in chunks]
+        else:
+            results = self._get_pool().map(_score_chunk, chunks)
+
+        scores = dict()
+        for key in ('rouge-1', 'rouge-2', 'rouge-l'):
+            chunk_scores = [result[key] for result in results]
+            scores[key] = np.concatenate(chunk_scores, axis=0) if chunk_scores else np.zeros((0, 3))
+        return scores
+
+    def evaluate(self, references, candidates):
+        """
+        정답/후보 쌍들의 평균 ROUGE 점수를 계산하는 기능
+
+        :param references: 정답 id 시퀀스 리스트 (type: list)
+        :param candidates: 후보 id 시퀀스 리스트 (type: list)
+        :return: {'rouge-1': {'p': , 'r': , 'f': }, 'rouge-2': {...}, 'rouge-l': {...}} (type: dict)
+        """
+        scores = self.score(references, candidates)
+        result = dict()
+        for key, value in scores.items():
+            mean = value.mean(axis=0) if len(value) else np.zeros(3)
+            result[key] = {'p': float(mean[0]), 'r': float(mean[1]), 'f': float(mean[2])}
+        return result
+
+
+def _naive_rouge(ref, cand):
+    """
+    self_check 용. Counter 와 2중 for 문 DP 로 계산한 ROUGE-1/2/L f1 (_UNK_ 는 서로 일치하지 않음)
+    """
+    ref = ['ref_unk' if idx == unk_id else idx for idx in ref if idx not in _IGNORE_IDS]
+    cand = ['cand_unk' if idx == unk_id else idx for idx in cand if idx not in _IGNORE_IDS]
+
+    def f1(overlap, ref_count, cand_count):
+        precision = overlap / cand_count if cand_count else 0.0
+        recall = overlap / ref_count if ref_count else 0.0
+        return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    result = list()
+    for n in (1, 2):
+        ref_ngrams = collections.Counter(tuple(ref[i:i + n]) for i in range(len(ref) - n + 1))
+        cand_ngrams = collections.Counter(tuple(cand[i:i + n]) for i in range(len(cand) - n + 1))
+        overlap = sum((ref_ngrams & cand_ngrams).values())
+        result.append(f1(overlap, sum(ref_ngrams.values()), sum(cand_ngrams.values())))
+
+    table = [[0] * (len(cand) + 1) for _ in range(len(ref) + 1)]
+    for i in range(1, len(ref) + 1):
+        for j in range(1, len(cand) + 1):
+            if ref[i - 1] == cand[j - 1]:
+                table[i][j] = table[i - 1][j - 1] + 1
+            else:
+                table[i][j] = max(table[i - 1][j], table[i][j - 1])
+    result.append(f1(table[-1][-1], len(ref), len(cand)))
+    return result
+
+
+def self_check(num_pairs=2000, seed=0):
+    """
+    해시 n-gram overlap 과 반대각선 LCS 결과가 단순 구현과 같은지 확인하는 기능
+    (작은 id 범위와 mask id 를 섞어 겹치는 n-gram, 빈 문장, 길이 차이가 자주 나오도록 함)
+    """
+    rng = np.random.RandomState(seed)
+    refs = [rng.randint(0, 12, size=rng.randint(0, 15)) for _ in range(num_pairs)]
+    cands = [rng.randint(0, 12, size=rng.randint(0, 15)) for _ in range(num_pairs)]
+
+    scores = _score_chunk(list(zip(refs, cands)))
+    expected = np.array([_naive_rouge(ref, cand) for ref, cand in zip(refs, cands)])
+    for k, key in enumerate(('rouge-1', 'rouge-2', 'rouge-l')):
+        assert np.allclose(scores[key][:, 2], expected[:, k]), key + ' 가 단순 구현과 다릅니다.'
+
+    # _UNK_ 끼리는 일치하지 않지만 분모에는 포함되어야 함
+    unk_scores = _score_chunk([([unk_id] * 10, [unk_id] * 5), ([4, unk_id, 5], [4, unk_id, 5])])
+    for key in unk_scores:
+        assert np.allclose(unk_scores[key][0], 0.0), key + ' 에서 _UNK_ 가 일치했습니다.'
+    assert np.allclose(unk_scores['rouge-1'][1], 2.0 / 3), 'rouge-1 분모에 _UNK_ 가 빠졌습니다.'
+    assert np.allclose(unk_scores['rouge-2'][1], 0.0), 'rouge-2 에서 _UNK_ 가 일치했습니다.'
+    assert np.allclose(unk_scores['rouge-l'][1], 2.0 / 3), 'rouge-l 분모에 _UNK_ 가 빠졌습니다.'
+
+    # 풀을 거친 결과도 같아야 함
+    with RougeEvaluator(num_workers=2, chunk_size=num_pairs // 4 or 1) as evaluator:
+        pooled = evaluator.score(refs, cands)
+    for key in scores:
+        assert np.allclose(pooled[key], scores[key]), key + ' 의 프로세스 풀 결과가 다릅니다.'
+    print('ROUGE self check 통과... {} 쌍'.format(num_pairs))
+
+
+if __name__ == '__main__':
+    self_check()
+
+    # 단어장 크기 범위의 임의의 id 시퀀스 10000 쌍으로 평가 속도 측정
+    word2idx_path = sys.argv[1] if len(sys.argv) > 1 else _WORD2IDX_PATH
+    with open(word2idx_path, 'rb') as fp:
+        vocab_size = len(pickle.load(fp))
+
+    rng = np.random.RandomState(0)
+    refs = [rng.randint(4, vocab_size, size=rng.randint(5, 20)) for _ in range(10000)]
+    cands = [np.concatenate([ref[:len(ref) // 2], rng.randint(4, vocab_size, size=5)]) for ref in refs]
+
+    with RougeEvaluator() as evaluator:
+        start_time = time.time()
+        print(evaluator.evaluate(refs, cands))
+        print('총 걸린 시간 : {} sec'.format(round(time.time() - start_time, 3)))
@@ -0,0 +1,291 @@
+# -*- coding:utf-8 -*-
+import collections
+import heapq
+import pickle
+import random
+import sys
+
+
+_UNK_ = '_UNK_'     # 알수없는 단어를 표시하기 위한 mask (단어장에 존재 하지 않는 단어)
+_PAD_ = '_PAD_'     # 길이를 맞춰주기 위한 mask
+_GO_ = '_GO_'       # 문장의 시작을 알려주기위한 mask
+_END_ = '_END_'     # 문장의 끝을 알려구기위한 mask
+unk_id = 0          # _UNK_ number id
+pad_id = 1          # _PAD_ number id
+go_id = 2           # _GO_  number id
+end_id = 3          # _EMD_ number id
+MASK_INFO = {
+    _UNK_: unk_id,
+    _PAD_: pad_id,
+    _GO_: go_id,
+    _END_: end_id
+}
+
+_EOW_ = '</w>'      # 단어의 끝을 알려주기 위한 subword 표시
+
+
+def _word_to_symbols(word):
+    """
+    단어를 글자 단위 symbol 로 나누고 마지막 글자에 단어 끝 표시를 붙이는 기능
+    ex) 사랑해 -> ('사', '랑', '해</w>')
+    """
+    return tuple(word[:-1]) + (word[-1] + _EOW_,)
+
+
+def learn_bpe(word_counts, vocab_size, min_frequency=2):
+    """
+    단어별 출현횟수로부터 byte-pair encoding 병합 규칙을 학습하는 기능
+
+    가장 많이 등장하는 인접 symbol 쌍을 하나의 subword 로 병합하는 과정을
+    단어장 크기가 vocab_size 가 될 때까지 반복
+    (쌍의 출현횟수는 병합된 단어들에 대해서만 갱신하고, 최빈 쌍은 heap 으로 찾음)
+
+    :param word_counts: 단어별 출현횟수 (type: dict)
+    :param vocab_size: MASK_INFO 를 포함한 목표 단어장 크기 (ex: 8000 ~ 16000) (type: int)
+    :param min_frequency: 이 값보다 적게 등장하는 쌍은 병합하지 않음 (type: int)
+    :return: vocab, merges
+        vocab : ['_UNK_', '_PAD_', '_GO_', '_END_', 'subword1', ...]
+        merges : [('symbol1', 'symbol2'), ...] (병합 순서대로)
+    """
+    words = [list(_word_to_symbols(word)) for word in word_counts if word]
+    freqs = [word_counts[word] for word in word_counts if word]
+
+    # 기본 symbol(글자)들은 출현횟수 순으로 단어장에 추가
+    symbol_counts = collections.Counter()
+    for symbols, freq in zip(words, freqs):
+        for symbol in symbols:
+            symbol_counts[symbol] += freq
+    vocab = list(MASK_INFO.keys())
+    vocab.extend(symbol for symbol, _ in symbol_counts.most_common())
+    if len(vocab) > vocab_size:
+        vocab = vocab[:vocab_size]
+
+    pair_counts = collections.Counter()
+    pair_index = collections.defaultdict(set)   # 쌍 -> 해당 쌍이 등장하는 단어 번호들
+    for i, (symbols, freq) in enumerate(zip(words, freqs)):
+        for pair in zip(symbols, symbols[1:]):
+            pair_counts[pair] += freq
+            pair_index[pair].add(i)
+
+    heap = [(-count, pair) for pair, count in pair_counts.items()]
+    heapq.heapify(heap)
+
+    merges = list()
+    while len(vocab) < vocab_size and heap:
+        count, best = heapq.heappop(heap)
+        if -count != pair_counts.get(best, 0):
+            continue    # 이미 갱신되어 유효하지 않은 heap 항목
+        if -count < min_frequency:
+            break
+
+        merged = best[0] + best[1]
+        merges.append(best)
+        vocab.append(merged)
+
+        changed = set()
+        for i in pair_index.pop(best):
+            symbols, freq = words[i], freqs[i]
+            new_symbols = list()
+            j = 0
+            while j < len(symbols):
+                if j < len(symbols) - 1 and symbols[j] == best[0] and symbols[j + 1] == best[1]:
+                    new_symbols.append(merged)
+                    j += 2
+                else:
+                    new_symbols.append(symbols[j])
+                    j += 1
+            if len(new_symbols) == len(symbols):
+                continue
+
+            for pair in zip(symbols, symbols[1:]):
+                pair_counts[pair] -= freq
+                changed.add(pair)
+            for pair in zip(new_symbols, new_symbols[1:]):
+                pair_counts[pair] += freq
+                pair_index[pair].add(i)
+                changed.add(pair)
+            words[i] = new_symbols
+
+        pair_counts.pop(best, None)
+        for pair in changed:
+            if pair == best:
+                continue
+            if pair_counts[pair] > 0:
+                heapq.heappush(heap, (-pair_counts[pair], pair))
+            else:
+                pair_counts.pop(pair, None)
+
+    return vocab, merges
+
+
+class SubwordEncoder(object):
+    """
+    학습된 병합 규칙으로 단어를 subword id 로 변환하는 클래스
+    한번 변환한 단어는 캐시에 저장하여 다시 병합하지 않음
+    """
+    def __init__(self,
+                 word2idx,
+                 merges):
+        """
+        :param word2idx: subword -> id 사전 (type: dict)
+        :param merges: 병합 규칙 리스트 (type: list)
+        """
+        self.word2idx = word2idx
+        self.idx2word = {idx: word for word, idx in word2idx.items()}
+        self._merge_ranks = {tuple(pair): rank for rank, pair in enumerate(merges)}
+        self._cache = dict()
+
+    @classmethod
+    def load(cls, word2idx_path, merges_path):
+        """
+        make_subword_dictionary 로 저장한 사전과 병합 규칙을 불러오는 기능
+        """
+        with open(word2idx_path, 'rb') as f:
+            word2idx = pickle.load(f)
+        with open(merges_path, 'rb') as f:
+            merges = pickle.load(f)
+        return cls(word2idx, merges)
+
+    def _bpe(self, word):
+        symbols = list(_word_to_symbols(word))
+        while len(symbols) > 1:
+            # 병합 순위가 가장 높은(먼저 학습된) 쌍부터 병합
+            pairs = list(zip(symbols, symbols[1:]))
+            best = min(pairs, key=lambda pair: self._merge_ranks.get(pair, float('inf')))
+            if best not in self._merge_ranks:
+                break
+            new_symbols = list()
+            j = 0
+            while j < len(symbols):
+                if j < len(symbols) - 1 and symbols[j] == best[0] and symbols[j + 1] == best[1]:
+                    new_symbols.append(symbols[j] + symbols[j + 1])
+                    j += 2
+                else:
+                    new_symbols.append(symbols[j])
+                    j += 1
+            symbols = new_symbols
+        return symbols
+
+    def encode_word(self, word):
+        """
+        단어 하나를 subword id 리스트로 변환 (단어장에 없는 symbol 은 _UNK_)
+
+        :param word: 단어 (type: str)
+        :return: subword id 리스트 (type: list)
+        """
+        if word in MASK_INFO:
+            return [MASK_INFO[word]]
+        ids = self._cache.get(word)
+        if ids is None:
+            ids = [self.word2idx.get(symbol, unk_id) for symbol in self._bpe(word)]
+            self._cache[word] = ids
+        return ids
+
+    def encode(self, tokens):
+        """
+        토큰나이즈 된 문장을 subword id 리스트로 변환
+
+        :param tokens: 토큰 리스트 (type: list)
+        :return: subword id 리스트 (type: list)
+        """
+        ids = list()
+        for token in tokens:
+            if token:
+                ids.extend(self.encode_word(token))
+        return ids
+
+    def decode(self, ids):
+        """
+        subword id 리스트를 단어 리스트로 되돌리는 기능
+
+        :param ids: subword id 리스트 (type: list)
+        :return: 토큰 리스트 (type: list)
+        """
+        tokens = list()
+        word = ''
+        for idx in ids:
+            if idx in (pad_id, go_id, end_id):
+                continue
+            symbol = self.idx2word.get(idx, _UNK_)
+            if symbol in MASK_INFO:
+                # mask 는 앞뒤 subword 와 붙지 않도록 하나의 단어로 취급
+                if word:
+                    tokens.append(word)
+                    word = ''
+                tokens.append(symbol)
+            elif symbol.endswith(_EOW_):
+                tokens.append(word + symbol[:-len(_EOW_)])
+                word = ''
+            else:
+                word += symbol
+        if word:
+            tokens.append(word)
+        return tokens
+
+
+def _naive_learn_bpe(word_counts, num_merges, min_frequency=2):
+    """
+    self_check 용. 매 병합마다 쌍의 출현횟수를 처음부터 다시 세는 단순 BPE
+    (learn_bpe 와 같이 출현횟수가 같으면 사전순으로 앞선 쌍을 병합)
+    """
+    words = {word: list(_word_to_symbols(word)) for word in word_counts if word}
+    merges = list()
+    for _ in range(num_merges):
+        pair_counts = collections.Counter()
+        for word, symbols in words.items():
+            for pair in zip(symbols, symbols[1:]):
+                pair_counts[pair] += word_counts[word]
+        if not pair_counts:
+            break
+        best = min(pair_counts, key=lambda pair: (-pair_counts[pair], pair))
+        if pair_counts[best] < min_frequency:
+            break
+        merges.append(best)
+        for word, symbols in words.items():
+            new_symbols = list()
+            j = 0
+            while j < len(symbols):
+                if j < len(symbols) - 1 and (symbols[j], symbols[j + 1]) == best:
+                    new_symbols.append(symbols[j] + symbols[j + 1])
+                    j += 2
+                else:
+                    new_symbols.append(symbols[j])
+                    j += 1
+            words[word] = new_symbols
+    return merges
+
+
+def self_check(vocabulary_path=None, num_merges=50, seed=0):
+    """
+    heap 기반 learn_bpe 가 단순 BPE 와 같은 병합 규칙을 만드는지,
+    SubwordEncoder 의 encode/decode 가 단어를 그대로 되돌리는지 확인하는 기능
+
+    :param vocabulary_path: 왕복 변환을 확인할 vocabulary.txt 위치, None 이면 임의의 단어만 사용 (type: str)
+    """
+    rng = random.Random(seed)
+    word_counts = collections.Counter()
+    for _ in range(3000):
+        word = ''.join(rng.choice('가나다라마바') for _ in range(rng.randint(1, 6)))
+        word_counts[word] += rng.randint(1, 5)
+
+    num_special = len(MASK_INFO)
+    num_symbols = len(set(symbol for word in word_counts for symbol in _word_to_symbols(word)))
+    _, merges = learn_bpe(word_counts, num_special + num_symbols + num_merges)
+    assert merges == _naive_learn_bpe(word_counts, num_merges), '병합 규칙이 단순 BPE 와 다릅니다.'
+
+    words = list(word_counts)
+    if vocabulary_path:
+        with open(vocabulary_path, encoding='utf-8') as f:
+            words = [word for word in f.read().split() if word not in MASK_INFO]
+    vocab, merges = learn_bpe(collections.Counter(words), 8000, min_frequency=1)
+    encoder = SubwordEncoder({word: i for i, word in enumerate(vocab)}, merges)
+    for word in words:
+        assert encoder.decode(encoder.encode([word])) == [word], '{} 의 encode/decode 결과가 다릅니다.'.format(word)
+
+    ids = [unk_id] + encoder.encode([words[0]]) + [end_id]
+    assert encoder.decode(ids) == [_UNK_, words[0]], 'mask 가 다음 단어에 붙었습니다.'
+    print('subword self check 통과... 병합 {} 개, 단어 {} 개'.format(len(merges), len(words)))
+
+
+if __name__ == '__main__':
+    self_check(sys.argv[1] if len(sys.argv) > 1 else '../data/words/vocabulary.txt')
@@ -0,0 +1,367 @@
+# -*- coding:utf-8 -*-
+import multiprocessing
+import pickle
+import resource
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from subword import MASK_INFO, pad_id, go_id, end_id
+
+
+SOFTMAX_TYPES = ('full', 'sampled', 'adaptive')
+_WORD2IDX_PATH = '../data/words/dict/word2idx.dic'
+
+
+def load_counts(counts_path):
+    """
+    make_subword_dictionary 가 저장한 id 별 출현횟수(counts.dic)를 불러오는 기능
+
+    :param counts_path: counts.dic 위치 (type: str)
+    :return: {id: 출현횟수} (type: dict)
+    """
+    with open(counts_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def build_clusters(counts, vocab_size, cutoffs):
+    """
+    출현횟수를 기준으로 id 들을 정렬하여 adaptive softmax 의 cluster 를 나누는 기능
+
+    MASK_INFO 의 id 들(특히 매 문장마다 나오는 _END_)은 항상 head 에 포함되도록 맨 앞에 배치하고,
+    나머지 id 들은 출현횟수 내림차순으로 배치 (출현하지 않은 id 는 맨 뒤)
+
+    :param counts: {id: 출현횟수} (type: dict)
+    :param vocab_size: 단어장 크기 (type: int)
+    :param cutoffs: cluster 경계, 순서와 중복은 상관없음
+        (ex: [2000, 8000] -> head: 0~1999, tail1: 2000~7999, tail2: 8000~) (type: list)
+    :return: rank, cutoffs
+        rank : id -> 정렬된 순위 (type: np.ndarray)
+        cutoffs : vocab_size 를 마지막 경계로 추가한 cluster 경계 (type: list)
+    """
+    special_ids = sorted(MASK_INFO.values())
+    other_ids = [idx for idx in range(vocab_size) if idx not in MASK_INFO.values()]
+    other_ids.sort(key=lambda idx: -counts.get(idx, 0))
+    order = np.array(special_ids + other_ids, dtype=np.int32)
+
+    rank = np.empty(vocab_size, dtype=np.int32)
+    rank[order] = np.arange(vocab_size, dtype=np.int32)
+
+    cutoffs = sorted(set(cutoffs))
+    if not cutoffs or cutoffs[0] <= 0 or cutoffs[-1] >= vocab_size:
+        raise ValueError('cutoffs 는 0 보다 크고 단어장 크기({}) 보다 작아야 합니다.'.format(vocab_size))
+    return rank, cutoffs + [vocab_size]
+
+
+class SummaryModel(object):
+    """
+    본문을 입력받아 제목(요약문)을 생성하는 seq2seq 모델
+
+    decoder 출력층은 softmax_type 으로 선택
+    1. full : 매 step 마다 단어장 전체에 대해 softmax 계산
+    2. sampled : 학습할 때는 출현횟수 기반으로 뽑은 일부 단어에 대해서만 softmax 계산 (sampled softmax)
+    3. adaptive : 출현횟수로 나눈 cluster 중 정답이 속한 cluster 에 대해서만 softmax 계산 (adaptive softmax)
+
+    전체 단어에 대한 확률분포(log_probs)는 학습 op 와 분리되어 있어 추론/검증할 때만 계산됨
+    """
+    def __init__(self,
+                 vocab_size,
+                 embedding_size=128,
+                 hidden_size=256,
+                 softmax_type='full',
+                 counts=None,
+                 num_sampled=512,
+                 cutoffs=(2000, 8000),
+                 learning_rate=0.001):
+        """
+        :param vocab_size: 단어장 크기 (type: int)
+        :param embedding_size: 단어 embedding 크기 (type: int)
+        :param hidden_size: encoder/decoder GRU hidden 크기 (type: int)
+        :param softmax_type: 'full', 'sampled', 'adaptive' 중 하나 (type: str)
+        :param counts: {id: 출현횟수}, sampled 의 후보 추출과 adaptive 의 cluster 생성에 사용 (type: dict)
+        :param num_sampled: sampled softmax 에서 뽑을 단어 갯수 (type: int)
+        :param cutoffs: adaptive softmax 의 cluster 경계 (type: list)
+        :param learning_rate: Adam learning rate (type: float)
+        """
+        if softmax_type not in SOFTMAX_TYPES:
+            raise ValueError('softmax_type 은 {} 중 하나여야 합니다.'.format(SOFTMAX_TYPES))
+        if softmax_type != 'full' and counts is None:
+            raise ValueError('{} softmax 는 단어 출현횟수(counts)가 필요합니다.'.format(softmax_type))
+        cutoffs = sorted(set(cutoffs))
+        if softmax_type == 'adaptive' and (not cutoffs or cutoffs[0] <= 0 or cutoffs[-1] >= vocab_size):
+            raise ValueError('cutoffs 는 0 보다 크고 단어장 크기({}) 보다 작아야 합니다.'.format(vocab_size))
+
+        self.vocab_size = vocab_size
+        self.embedding_size = embedding_size
+        self.hidden_size = hidden_size
+        self.softmax_type = softmax_type
+        self.counts = counts
+        self.num_sampled = min(num_sampled, vocab_size)
+        self.cutoffs = cutoffs
+        self.learning_rate = learning_rate
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self._build_inputs()
+            hidden, labels, encoder_state = self._build_seq2seq()
+            self._build_output_layer(hidden, labels)
+            self._build_inference(encoder_state)
+            self.train_op = tf.train.AdamOptimizer(self.learning_rate).minimize(self.loss)
+            self.init = tf.global_variables_initializer()
+            self.saver = tf.train.Saver()
+
+    def _build_inputs(self):
+        with tf.name_scope('inputs'):
+            self.encoder_inputs = tf.placeholder(tf.int32, shape=[None, None], name='encoder_inputs')
+            self.encoder_length = tf.placeholder(tf.int32, shape=[None], name='encoder_length')
+            self.decoder_inputs = tf.placeholder(tf.int32, shape=[None, None], name='decoder_inputs')
+            self.decoder_targets = tf.placeholder(tf.int32, shape=[None, None], name='decoder_targets')
+            self.decoder_length = tf.placeholder(tf.int32, shape=[None], name='decoder_length')
+
+    def _build_seq2seq(self):
+        """
+        encoder/decoder 를 만들고 패딩을 제외한 decoder hidden 과 정답 id 를 펼쳐서 반환
+
+        :return: hidden [N, hidden_size], labels [N], encoder_state [batch, hidden_size]
+        """
+        with tf.name_scope('embeddings'):
+            self.embeddings = tf.Variable(
+                tf.random_uniform([self.vocab_size, self.embedding_size], -1.0, 1.0), name='embeddings')
+            # 단어장 크기에 비례하는 변수들 (export 할 때 상수로 바꾸지 않고 그래프 밖에 저장)
+            self.vocab_variables = [self.embeddings]
+            encoder_embed = tf.nn.embedding_lookup(self.embeddings, self.encoder_inputs)
+            decoder_embed = tf.nn.embedding_lookup(self.embeddings, self.decoder_inputs)
+
+        with tf.variable_scope('encoder'):
+            encoder_cell = tf.nn.rnn_cell.GRUCell(self.hidden_size)
+            _, encoder_state = tf.nn.dynamic_rnn(
+                encoder_cell, encoder_embed, sequence_length=self.encoder_length, dtype=tf.float32)
+
+        with tf.variable_scope('decoder'):
+            self._decoder_cell = tf.nn.rnn_cell.GRUCell(self.hidden_size)
+            decoder_outputs, _ = tf.nn.dynamic_rnn(
+                self._decoder_cell, decoder_embed, sequence_length=self.decoder_length, initial_state=encoder_state)
+
+        # 패딩 위치는 출력층 계산에서 제외
+        mask = tf.sequence_mask(self.decoder_length, tf.shape(self.decoder_targets)[1])
+        hidden = tf.boolean_mask(decoder_outputs, mask)
+        labels = tf.boolean_mask(self.decoder_targets, mask)
+        return hidden, labels, encoder_state
+
+    def _build_output_layer(self, hidden, labels):
+        with tf.variable_scope('output'):
+            if self.softmax_type == 'adaptive':
+                self.loss = self._adaptive_softmax(hidden, labels)
+                self.log_probs = self._output_log_probs(hidden)
+                return
+
+            self._output_weights = tf.get_variable(
+                'weights', [self.vocab_size, self.hidden_size],
+                initializer=tf.truncated_normal_initializer(stddev=1.0 / np.sqrt(self.hidden_size)))
+            self._output_biases = tf.get_variable('biases', [self.vocab_size], initializer=tf.zeros_initializer())
+            self.vocab_variables.extend([self._output_weights, self._output_biases])
+
+            # 전체 단어에 대한 확률분포 (추론/검증할 때만 실행)
+            logits = tf.nn.xw_plus_b(hidden, tf.transpose(self._output_weights), self._output_biases)
+            self.log_probs = tf.nn.log_softmax(logits)
+
+            if self.softmax_type == 'full':
+                self.loss = tf.reduce_mean(
+                    tf.nn.sparse_softmax_cross_entropy_with_logits(labels=labels, logits=logits))
+                return
+
+            # 단어장 출현횟수에 비례하여 negative 후보를 추출
+            true_classes = tf.cast(tf.expand_dims(labels, 1), tf.int64)
+            unigrams = [float(self.counts.get(idx, 0)) + 1.0 for idx in range(self.vocab_size)]
+            sampled_values = tf.nn.fixed_unigram_candidate_sampler(
+                true_classes=true_classes,
+                num_true=1,
+                num_sampled=self.num_sampled,
+                unique=True,
+                range_max=self.vocab_size,
+                distortion=0.75,
+                unigrams=unigrams)
+            self.loss = tf.reduce_mean(
+                tf.nn.sampled_softmax_loss(
+                    weights=self._output_weights,
+                    biases=self._output_biases,
+                    labels=true_classes,
+                    inputs=hidden,
+                    num_sampled=self.num_sampled,
+                    num_classes=self.vocab_size,
+                    sampled_values=sampled_values))
+
+    def _output_log_probs(self, hidden):
+        """
+        decoder hidden 으로부터 단어장 전체에 대한 log 확률분포를 계산 (학습 때 만든 출력층 변수를 재사용)
+
+        :param hidden: [N, hidden_size]
+        :return: log_probs [N, vocab_size]
+        """
+        if self.softmax_type != 'adaptive':
+            logits = tf.nn.xw_plus_b(hidden, tf.transpose(self._output_weights), self._output_biases)
+            return tf.nn.log_softmax(logits)
+
+        cutoffs = self._cutoffs
+        head_log_probs = tf.nn.log_softmax(tf.matmul(hidden, self._head_weights))
+        tail_log_probs = list()
+        for i, (proj, tail_weights) in enumerate(self._tails):
+            tail_log_probs.append(
+                tf.nn.log_softmax(tf.matmul(tf.matmul(hidden, proj), tail_weights))
+                + head_log_probs[:, cutoffs[0] + i:cutoffs[0] + i + 1])
+
+        # 순위 순서의 확률분포를 원래 id 순서로 되돌림
+        ranked_log_probs = tf.concat([head_log_probs[:, :cutoffs[0]]] + tail_log_probs, axis=1)
+        return tf.gather(ranked_log_probs, self._rank_table, axis=1)
+
+    def _adaptive_softmax(self, hidden, labels):
+        """
+        출현횟수 순으로 나눈 cluster 를 이용한 adaptive softmax
+
+        head 는 자주 나오는 단어들과 각 tail cluster 를 대표하는 class 로 구성되고,
+        tail cluster 는 뒤로 갈수록 작은 차원으로 projection 하여 계산량을 줄임
+
+        :return: loss
+        """
+        rank_table, cutoffs = build_clusters(self.counts, self.vocab_size, self.cutoffs)
+        self._rank_table = tf.constant(rank_table)
+        self._cutoffs = cutoffs
+        head_size = cutoffs[0] + len(cutoffs) - 1
+
+        ranks = tf.gather(self._rank_table, labels)
+        num_labels = tf.cast(tf.shape(labels)[0], tf.float32)
+
+        self._head_weights = tf.get_variable('head_weights', [self.hidden_size, head_size])
+        self.vocab_variables.append(self._head_weights)
+        head_logits = tf.matmul(hidden, self._head_weights)
+
+        # head 에 없는 단어는 자신이 속한 cluster 의 대표 class 를 정답으로 사용
+        head_labels = ranks
+        self._tails = list()
+        tail_losses = list()
+        for i in range(len(cutoffs) - 1):
+            low, high = cutoffs[i], cutoffs[i + 1]
+            proj_size = max(1, self.hidden_size // (4 ** (i + 1)))
+            proj = tf.get_variable('tail{}_proj'.format(i), [self.hidden_size, proj_size])
+            tail_weights = tf.get_variable('tail{}_weights'.format(i), [proj_size, high - low])
+            self._tails.append((proj, tail_weights))
+            self.vocab_variables.append(tail_weights)
+
+            in_cluster = tf.logical_and(ranks >= low, ranks < high)
+            head_labels = tf.where(in_cluster, tf.fill(tf.shape(ranks), cutoffs[0] + i), head_labels)
+
+            # 정답이 이 cluster 에 속한 위치만 tail softmax 계산
+            cluster_hidden = tf.boolean_mask(hidden, in_cluster)
+            cluster_labels = tf.boolean_mask(ranks, in_cluster) - low
+            cluster_logits = tf.matmul(tf.matmul(cluster_hidden, proj), tail_weights)
+            tail_losses.append(tf.reduce_sum(
+                tf.nn.sparse_softmax_cross_entropy_with_logits(labels=cluster_labels, logits=cluster_logits)))
+
+        head_loss = tf.reduce_sum(
+            tf.nn.sparse_softmax_cross_entropy_with_logits(labels=head_labels, logits=head_logits))
+        return (head_loss + tf.add_n(tail_losses)) / num_labels if tail_losses else head_loss / num_labels
+
+    def _build_inference(self, encoder_state):
+        """
+        encoder 결과로부터 _GO_ 부터 시작하여 _END_ 가 나올 때까지 greedy 하게 요약문을 생성하는 그래프
+        (export.py 에서 이 그래프만 남기고 얼려서 배포)
+        """
+        with tf.name_scope('inference'):
+            self.max_length = tf.placeholder_with_default(30, shape=[], name='max_length')
+            batch_size = tf.shape(self.encoder_inputs)[0]
+
+            def cond(step, prev_ids, state, outputs, finished):
+                return tf.logical_and(step < self.max_length, tf.logical_not(tf.reduce_all(finished)))
+
+            def body(step, prev_ids, state, outputs, finished):
+                embed = tf.nn.embedding_lookup(self.embeddings, prev_ids)
+                output, state = self._decoder_cell(embed, state)
+                next_ids = tf.argmax(self._output_log_probs(output), axis=1, output_type=tf.int32)
+                next_ids = tf.where(finished, tf.fill(tf.shape(next_ids), pad_id), next_ids)
+                outputs = outputs.write(step, next_ids)
+                finished = tf.logical_or(finished, tf.equal(next_ids, end_id))
+                return step + 1, next_ids, state, outputs, finished
+
+            _, _, _, outputs, _ = tf.while_loop(
+                cond, body,
+                loop_vars=[
+                    tf.constant(0),
+                    tf.fill([batch_size], go_id),
+                    encoder_state,
+                    tf.TensorArray(tf.int32, size=0, dynamic_size=True),
+                    tf.zeros([batch_size], dtype=tf.bool)
+                ])
+            self.summary_ids = tf.transpose(outputs.stack(), name='summary_ids')    # [batch, step]
+
+    def make_feed_dict(self, encoder_inputs, encoder_length, decoder_inputs, decoder_targets, decoder_length):
+        return {
+            self.encoder_inputs: encoder_inputs,
+            self.encoder_length: encoder_length,
+            self.decoder_inputs: decoder_inputs,
+            self.decoder_targets: decoder_targets,
+            self.decoder_length: decoder_length
+        }
+
+
+def _benchmark(softmax_type, vocab_size, batch_size, seq_length, num_steps, counts=None):
+    """
+    tiny CPU 설정에서 softmax 종류별 학습 속도와 최대 메모리 사용량을 측정
+    (메모리를 따로 재기 위해 별도의 프로세스에서 실행)
+
+    :param counts: make_subword_dictionary 가 저장한 출현횟수, None 이면 zipf 분포로 만든 가짜 출현횟수 (type: dict)
+    :return: softmax_type, steps/sec, 최대 RSS (MB)
+    """
+    rng = np.random.RandomState(0)
+    if counts is None:
+        # 단어장 전체에 대해 정규화한 zipf 분포로 만든 가짜 출현횟수
+        # (make_dictionary 의 단어장은 사전순이므로 빈도 순위와 id 를 섞어서 배치)
+        zipf = 1.0 / np.arange(1, vocab_size + 1) ** 1.1
+        counts = dict(zip(rng.permutation(vocab_size).tolist(), (zipf * 1e6).astype(np.int64).tolist()))
+
+    # 출현횟수 분포를 따르는 가짜 말뭉치
+    ids = np.array(list(counts.keys()), dtype=np.int32)
+    freqs = np.array(list(counts.values()), dtype=np.float64)
+    corpus = rng.choice(ids, size=200000, p=freqs / freqs.sum())
+
+    model = SummaryModel(
+        vocab_size=vocab_size,
+        embedding_size=64,
+        hidden_size=64,
+        softmax_type=softmax_type,
+        counts=counts,
+        num_sampled=256
+    )
+
+    def random_batch():
+        tokens = rng.choice(corpus, size=(batch_size, seq_length + 1))
+        lengths = np.full(batch_size, seq_length, dtype=np.int32)
+        return model.make_feed_dict(tokens[:, :-1], lengths, tokens[:, :-1], tokens[:, 1:], lengths)
+
+    with tf.Session(graph=model.graph) as session:
+        session.run(model.init)
+        session.run(model.train_op, feed_dict=random_batch())     # warm up
+
+        start_time = time.time()
+        for _ in range(num_steps):
+            session.run(model.train_op, feed_dict=random_batch())
+        steps_per_sec = num_steps / (time.time() - start_time)
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return softmax_type, steps_per_sec, max_rss
+
+
+if __name__ == '__main__':
+    # 벤치마크의 단어장 크기는 실제 사전 크기를 사용
+    # 사용법 : python summary_model.py [word2idx.dic] [counts.dic]
+    word2idx_path = sys.argv[1] if len(sys.argv) > 1 else _WORD2IDX_PATH
+    with open(word2idx_path, 'rb') as fp:
+        benchmark_vocab_size = len(pickle.load(fp))
+    benchmark_counts = load_counts(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    for name in SOFTMAX_TYPES:
+        # 각 설정마다 새 프로세스를 띄워 메모리 측정이 섞이지 않도록 함
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            result = pool.apply(_benchmark, (name, benchmark_vocab_size, 32, 20, 50, benchmark_counts))
+        print('softmax : {:>8}, {:.2f} steps/sec, max memory : {:.1f} MB'.format(*result))
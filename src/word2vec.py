@@ -20,7 +20,7 @@ f = open("../data/words/vocabulary.txt", 'r', encoding='utf-8')
 vocabulary = f.read().split()
 print('Data size', len(vocabulary))
 # Step 2: Build the dictionary and replace rare words with UNK token.
-vocabulary_size = 45306
+vocabulary_size = len(vocabulary)  # vocabulary.txt 를 공백으로 나눈 단어 갯수 (word2idx.dic 의 크기와는 다를 수 있음)
 
 def build_dataset(words, n_words):
   """Process raw inputs into a dataset."""